@@ -1,12 +1,276 @@
+import multiprocessing
 import random
+import time
+import warnings
+import weakref
+from array import array
+from collections import defaultdict
 from math import log
 
+# Transposition table entry flags
+# EXACT - stored value is the exact minimax value of the state
+# LOWER - stored value is a lower bound (search failed high)
+# UPPER - stored value is an upper bound (search failed low)
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+
+# Transposition table size (entries per bucket, power of 2). The table has
+# two buckets: depth-preferred and always-replace.
+TT_SIZE = 1 << 16
+TT_MASK = TT_SIZE - 1
+
+# Clock is read only once every (TIMER_CHECK_MASK + 1) searched nodes.
+# A node costs roughly 25-100 microseconds, so 32 nodes stay well inside
+# the default 10 ms timer threshold.
+TIMER_CHECK_MASK = 0x1F
+
+# Maximum search ply tracked by killer move heuristic, larger than number of
+# cells of any board the game is played on
+MAX_DEPTH = 128
+
+# Iterative deepening: first search depth, and estimated growth of search
+# time from one depth to the next (effective branching factor)
+ID_START_DEPTH = 2
+ID_BRANCHING_FACTOR = 4
+
+# Aspiration window: half width of alpha-beta window around the previous
+# iterative deepening score (heuristic scores differ by about one move)
+ASPIRATION_WINDOW = 1.0
+
+# Opening book: (own location, opponent location) -> move, for the first
+# three plies of a 7x7 game where these two locations are the whole board
+# state, one entry per set of symmetric positions (looked up by `_book_move`).
+# Generated by `opening_book.py` (fixed depth 11 alpha-beta search with
+# `custom_score`); regenerate it when search or heuristic changes.
+OPENING_BOOK = {
+    # Ply 0: first player's first move (hand-picked)
+    (None, None): (4, 4),
+    # Ply 1: second player's first move
+    (None, (0, 0)): (5, 2), (None, (0, 1)): (2, 2), (None, (0, 2)): (6, 1),
+    (None, (0, 3)): (3, 3), (None, (1, 1)): (4, 1), (None, (1, 2)): (2, 2),
+    (None, (1, 3)): (2, 3), (None, (2, 2)): (3, 2), (None, (2, 3)): (2, 2),
+    (None, (3, 3)): (2, 2),
+    # Ply 2: first player's second move after the first move (or its image)
+    ((2, 2), (0, 0)): (3, 4), ((2, 2), (0, 1)): (3, 4), ((2, 2), (0, 2)): (4, 3),
+    ((2, 2), (0, 3)): (3, 4), ((2, 2), (0, 4)): (4, 3), ((2, 2), (0, 5)): (3, 4),
+    ((2, 2), (0, 6)): (1, 0), ((2, 2), (1, 1)): (3, 4), ((2, 2), (1, 2)): (3, 4),
+    ((2, 2), (1, 3)): (4, 3), ((2, 2), (1, 4)): (3, 4), ((2, 2), (1, 5)): (3, 4),
+    ((2, 2), (1, 6)): (3, 4), ((2, 2), (2, 3)): (4, 3), ((2, 2), (2, 4)): (0, 1),
+    ((2, 2), (2, 5)): (0, 3), ((2, 2), (2, 6)): (3, 0), ((2, 2), (3, 3)): (3, 4),
+    ((2, 2), (3, 4)): (4, 3), ((2, 2), (3, 5)): (3, 4), ((2, 2), (3, 6)): (1, 4),
+    ((2, 2), (4, 4)): (3, 4), ((2, 2), (4, 5)): (3, 0), ((2, 2), (4, 6)): (4, 3),
+    ((2, 2), (5, 5)): (0, 1), ((2, 2), (5, 6)): (3, 4), ((2, 2), (6, 6)): (1, 4),
+}
+
+# Rotations and reflections of (row, column) on a 7x7 board: the opening
+# book stores one of each set of positions they map onto each other
+BOARD_SYMMETRIES = (lambda r, c: (r, c), lambda r, c: (c, 6 - r),
+                    lambda r, c: (6 - r, 6 - c), lambda r, c: (6 - c, r),
+                    lambda r, c: (6 - r, c), lambda r, c: (r, 6 - c),
+                    lambda r, c: (c, r), lambda r, c: (6 - c, 6 - r))
+
+BOOK_CELLS = [(r, c) for c in range(7) for r in range(7)]
+
+
+def _canonical_book_key(key):
+    """Return smallest image of opening book key (own location, opponent
+    location) under `BOARD_SYMMETRIES` and the symmetry mapping `key` to it.
+    """
+    def image(sym):
+        return tuple(None if (loc is None) else sym(*loc) for loc in key)
+
+    sym = min(BOARD_SYMMETRIES, key=lambda s: [loc or (-1, -1) for loc in image(s)])
+    return image(sym), sym
+
+
+def _book_move(own_loc, opp_loc):
+    """Return opening book move of a 7x7 game where the player is at
+    `own_loc` and opponent at `opp_loc` (None when not on the board yet),
+    or None when the position is not in the book.
+    """
+    key, sym = _canonical_book_key((own_loc, opp_loc))
+    move = OPENING_BOOK.get(key)
+    if move is None:
+        return None
+    # Map stored move back to the position searched for
+    return next(cell for cell in BOOK_CELLS if sym(*cell) == move)
+
+
+# Natural log of available moves ratio for every (own_moves, opp_moves) pair
+# once both players are on the board (at most 8 knight moves each)
+LOG_TABLE = [[log(i / j) if (i and j) else 0.0 for j in range(9)] for i in range(9)]
+
+# Knight move directions (row, column)
+KNIGHT_DIRECTIONS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                     (1, -2), (1, 2), (2, -1), (2, 1))
+
+# Translation of board cells (0 - blank, 1 - blocked) into binary digits
+_BIT_CHARS = bytes.maketrans(b'\x00\x01', b'01')
+
+# Knight move bitboards for each board size: (width, height) -> list of masks
+# where bit i of mask of cell idx is set when cell i is a knight move away
+_KNIGHT_MASKS = {}
+
+try:
+    _popcount = int.bit_count
+except AttributeError:
+    def _popcount(x):
+        return bin(x).count("1")
+
+
+def _knight_masks(width, height):
+    """Return knight move bitboards of every cell of a `width` x `height`
+    board, cell (r, c) is bit r + c * height as in `game._board_state`.
+    """
+    masks = _KNIGHT_MASKS.get((width, height))
+    if masks is None:
+        masks = []
+        for idx in range(width * height):
+            r, c = idx % height, idx // height
+            mask = 0
+            for dr, dc in KNIGHT_DIRECTIONS:
+                if (0 <= r + dr < height) and (0 <= c + dc < width):
+                    mask |= 1 << (r + dr + (c + dc) * height)
+            masks.append(mask)
+        _KNIGHT_MASKS[(width, height)] = masks
+    return masks
+
+
+# Knight move bitboards of standard 7x7 board
+KNIGHT_MASK = _knight_masks(7, 7)
+
+# Knight moves for each board size: (width, height) -> list of tuples of
+# (move, cell index) pairs reachable from each cell index
+_KNIGHT_MOVES = {}
+
+
+def _legal_moves_from(width, height):
+    """Return knight moves staying on a `width` x `height` board from every
+    cell, as (move, cell index) pairs.
+    """
+    table = _KNIGHT_MOVES.get((width, height))
+    if table is None:
+        table = []
+        for idx in range(width * height):
+            r, c = idx % height, idx // height
+            table.append(tuple(((r + dr, c + dc), r + dr + (c + dc) * height)
+                               for dr, dc in KNIGHT_DIRECTIONS
+                               if (0 <= r + dr < height) and (0 <= c + dc < width)))
+        _KNIGHT_MOVES[(width, height)] = table
+    return table
+
+
+# Knight moves of standard 7x7 board
+_LEGAL_MOVES_FROM = _legal_moves_from(7, 7)
+
+
+def _legal_moves(game):
+    """Return legal moves of the active player, same as
+    `game.get_legal_moves()` but read from precomputed knight moves and not
+    shuffled.
+    """
+    board_state = game._board_state
+
+    # Location of active player, player 1 moves when board_state[-3] is 0
+    loc = board_state[-2] if board_state[-3] else board_state[-1]
+
+    # Player not on the board yet can move to any blank cell
+    if loc is None:
+        return game.get_legal_moves()
+
+    if (game.width == 7) and (game.height == 7):
+        table = _LEGAL_MOVES_FROM
+    else:
+        table = _legal_moves_from(game.width, game.height)
+
+    return [move for move, idx in table[loc] if not board_state[idx]]
+
+
+def _move_counts(own_mask, opp_mask, occupied):
+    """Return number of cells of knight move bitboards `own_mask` and
+    `opp_mask` not in `occupied` bitboard.
+    """
+    blank = ~occupied
+    return _popcount(own_mask & blank), _popcount(opp_mask & blank)
+
+
+# Compiled search (game_agent_core.pyx), used when built
+try:
+    import game_agent_core as _core
+except ImportError:
+    _core = None
+
 
 class SearchTimeout(Exception):
     """Subclass base exception for code clarity. """
     pass
 
 
+def _both_move_counts(game, player):
+    """Count legal moves of `player` and its opponent with bitboards.
+
+    Blocked cells of `game._board_state` are packed into one integer, legal
+    moves of a player are the bits of its knight move mask not blocked.
+
+    Returns
+    -------
+    (int, int)
+        Number of legal moves of player and of opponent
+    """
+    board_state = game._board_state
+
+    # Location (cell index) of each player, player 1 is stored last
+    if player == game._player_1:
+        own_idx, opp_idx = board_state[-1], board_state[-2]
+    else:
+        own_idx, opp_idx = board_state[-2], board_state[-1]
+
+    # Player not on the board yet can move to any blank cell
+    if (own_idx is None) or (opp_idx is None):
+        opponent = game.get_opponent(player)
+        return len(game.get_legal_moves(player)), len(game.get_legal_moves(opponent))
+
+    if (game.width == 7) and (game.height == 7):
+        masks = KNIGHT_MASK
+    else:
+        masks = _knight_masks(game.width, game.height)
+
+    occupied = int(bytes(board_state[:-3]).translate(_BIT_CHARS)[::-1], 2)
+
+    return _move_counts(masks[own_idx], masks[opp_idx], occupied)
+
+
+def _make_move(game, move):
+    """Apply `move` to `game` in place (no copy of the board as in
+    `game.forecast_move`).
+
+    Returns
+    -------
+    tuple
+        Undo record for `_unmake_move`: moved-to cell index, board state slot
+        of the mover's location and mover's previous location
+    """
+    board_state = game._board_state
+    slot = -2 if (game._active_player == game._player_2) else -1
+    undo = (move[0] + move[1] * game.height, slot, board_state[slot])
+    game.apply_move(move)
+    return undo
+
+
+def _unmake_move(game, undo):
+    """Take back the move recorded in `undo` by `_make_move`."""
+    idx, slot, prev_loc = undo
+    board_state = game._board_state
+    board_state[idx] = 0
+    board_state[slot] = prev_loc
+    board_state[-3] ^= 1
+    game._active_player, game._inactive_player = game._inactive_player, game._active_player
+    game.move_count -= 1
+
+
+# Compiled twin: SearchState.score (SCORE_DIFF) in game_agent_core.pyx, used
+# instead of this function by the compiled search; keep the two in sync
 def custom_score(game, player):
     """Custom Hueristic 1 - Moves Difference
 
@@ -30,13 +294,14 @@ def custom_score(game, player):
     """
     
     # get avaliable moves for each player
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+    own_moves, opp_moves = _both_move_counts(game, player)
     
     # return different between # of my agent's move and oppenent's
     return float(own_moves - opp_moves)
 
 
+# Compiled twin: SearchState.score (SCORE_RATIO) in game_agent_core.pyx, used
+# instead of this function by the compiled search; keep the two in sync
 def custom_score_2(game, player):
     """Custom Hueristic 2 - Avaliable Move Ratio
     This hueristic prefer state that diffrence between avaliable moves of 
@@ -63,8 +328,7 @@ def custom_score_2(game, player):
     """
     
     # get avaliable moves for each player
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+    own_moves, opp_moves = _both_move_counts(game, player)
     
     # shortcut to definite state:
     # 1. my agent win -> return very high score
@@ -78,6 +342,8 @@ def custom_score_2(game, player):
     return float(own_moves/opp_moves)
 
 
+# Compiled twin: SearchState.score (SCORE_LOG_RATIO) in game_agent_core.pyx, used
+# instead of this function by the compiled search; keep the two in sync
 def custom_score_3(game, player):
     """Custom Hueristic 3 - Natural Log of Avaliable Move Ratio
     This hueristic is modified version of Avaliable Move Ratio.
@@ -102,8 +368,7 @@ def custom_score_3(game, player):
         The heuristic value of the current game state to the specified player.
     """
     # get avaliable moves for each player
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+    own_moves, opp_moves = _both_move_counts(game, player)
     
     # shortcut to definite state:
     # 1. my agent win -> return very high score
@@ -114,8 +379,20 @@ def custom_score_3(game, player):
         return float("-inf")
 
     # score: log of avaliable moves ratio
+    # use precomputed table, only players not yet on the board can have
+    # more than 8 moves
+    if (own_moves < 9) and (opp_moves < 9):
+        return LOG_TABLE[own_moves][opp_moves]
     return float(log(own_moves/opp_moves))
 
+
+# Heuristics re-implemented by the compiled search: score function -> kind.
+# With game_agent_core built, searches with these heuristics skip the Python
+# search (transposition table, killer and history move ordering, evaluation
+# cache) unless a player is not on the board yet
+_CORE_SCORES = {custom_score: 0, custom_score_2: 1, custom_score_3: 2}
+
+
 class IsolationPlayer:
     """Base class for minimax and alphabeta agents -- this class is never
     constructed or tested directly.
@@ -197,87 +474,22 @@ class MinimaxPlayer(IsolationPlayer):
         return best_move
     
     def minimax(self, game, depth):
-        
+
         # Timeout Check
         if self.time_left() < self.TIMER_THRESHOLD:
             raise SearchTimeout()
-        
-        # Helper Function1: max
-        def max_value(self, game, depth):
-            """This is helper function for minimax
-            Max_value (self, game, depth)
-
-            Parameters:
-            game: game state
-            depth: search depth
 
-            Find minimum score of each game state corresponding to its legal moves
-            Return score of that state when search complete.
-            """
-            
-            # Timeout Check
-            if self.time_left() < self.TIMER_THRESHOLD:
-                raise SearchTimeout()
+        # Cache search deadline so helper functions only need to read the clock
+        self._deadline = time.monotonic() + (self.time_left() - self.TIMER_THRESHOLD) / 1000.
+        self._node_count = 0
 
-            # Get legal moves
-            valid_moves = game.get_legal_moves()            
-            # Best possible score -> initiated at -inf, the lowest score possible
-            best_value = float("-inf")
-
-            # Terminal State:
-            # When search reaches search limit or no legal moves left
-            # Return score of terminal state
-            if (depth == 0) or (not valid_moves):
-                return self.score(game, self)
-            
-            # Search each move in legal moves
-            for move in valid_moves:
-
-                # Update best possible value with current best or search value 
-                best_value = max(best_value, min_value(self, game.forecast_move(move), depth-1))
-
-            # Return best value (in this case max value)
-            return best_value
+        # Moves are made and taken back in place on a private copy, so the
+        # caller's game is untouched even when search times out
+        game = game.copy()
         
-        def min_value(self, game, depth):
-            """This is helper function for minimax
-                Min_value (self, game, depth)
-
-                Parameters:
-                game: game state
-                depth: search depth
-
-                Find minimum score of each game state corresponding to its legal moves
-                Return score of that state when search complete.
-            """
-
-            # Timeout Check 
-            if self.time_left() < self.TIMER_THRESHOLD:
-                raise SearchTimeout()
-
-            # Get legal moves
-            valid_moves = game.get_legal_moves()
-            # Best possible score -> initiated at inf, the highest score possible
-            best_value = float("inf")
-
-            # Terminal State:
-            # When search reaches search limit or no legal moves left
-            # Return score of terminal state
-            if (depth == 0) or (not valid_moves):
-                return self.score(game, self)
-
-            # Search each move in legal moves
-            for move in valid_moves:
-                
-                # Update best possible value with current best or search value 
-                best_value = min(best_value, max_value(self, game.forecast_move(move), depth-1))
-            
-            # Return best value (in this case min value) 
-            return best_value
-
         # Main MiniMax Function
         # Get legal moves
-        valid_moves = game.get_legal_moves()
+        valid_moves = _legal_moves(game)
 
         # Best possible move -> initiated at (-1,-1)
         # Best possible score -> initiated at -inf, the lowest score possible
@@ -290,25 +502,165 @@ class MinimaxPlayer(IsolationPlayer):
             return (-1, -1)
 
         # Search best move from each move in legal moves
-        # Using minimax by first call min_value (helper function)
+        # Using negamax (helper function) from opponent's point of view
         # While searching, if any move return better score than current best
         # score, set that move and corresponding score as new target.
         for move in valid_moves:
-            score = min_value(self, game.forecast_move(move), depth-1)
-            if score > best_score:
+            undo = _make_move(game, move)
+            score = -self._negamax(game, depth-1, -1)
+            _unmake_move(game, undo)
+            # First move is kept even when every move loses (-inf score)
+            if (score > best_score) or (best_move == (-1, -1)):
                 best_move = move
                 best_score = score
 
         # At the end of search, return best move for that state.
         return best_move
 
+    def _negamax(self, game, depth, color):
+        """This is helper function for minimax
+            _negamax (self, game, depth, color)
+
+            Parameters:
+            game: game state
+            depth: search depth
+            color: +1 when my agent is to move, -1 when opponent is to move
+
+            Find maximum negated score of each game state corresponding to its
+            legal moves, i.e. the score from point of view of player to move.
+            Return score of that state when search complete.
+        """
+
+        # Timeout Check (amortized over TIMER_CHECK_MASK + 1 nodes)
+        self._node_count += 1
+        if not (self._node_count & TIMER_CHECK_MASK) and time.monotonic() > self._deadline:
+            raise SearchTimeout()
+
+        # Get legal moves
+        valid_moves = _legal_moves(game)
+
+        # Terminal State:
+        # When search reaches search limit or no legal moves left
+        # Return score of terminal state for player to move
+        if (depth == 0) or (not valid_moves):
+            return color * self.score(game, self)
+
+        # Best possible score -> initiated at -inf, the lowest score possible
+        best_value = float("-inf")
+
+        # Local alias avoids attribute lookup inside the loop
+        negamax = self._negamax
+
+        # Search each move in legal moves
+        for move in valid_moves:
+
+            # Update best possible value with current best or search value
+            undo = _make_move(game, move)
+            value = -negamax(game, depth-1, -color)
+            _unmake_move(game, undo)
+            if value > best_value:
+                best_value = value
+
+        # Return best value
+        return best_value
+
 
 class AlphaBetaPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using iterative deepening minimax
     search with alpha-beta pruning. You must finish and test this player to
     make sure it returns a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    processes : int (optional)
+        Number of worker processes searching root moves in parallel (root
+        parallelization); 0 searches in this process. `score_fn` must be
+        picklable (a module level function) when using worker processes.
+        Only pays off with several free CPU cores: workers cannot share
+        transposition tables or alpha-beta bounds, so on a single core
+        parallel search reaches shallower depth than sequential search.
+        Workers search each root move with a full window (no aspiration
+        windows), with the compiled search under the same conditions as
+        `alphabeta`. Workers are started here; call `close()` to terminate
+        them when done playing.
     """
 
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10., processes=0):
+        super().__init__(search_depth, score_fn, timeout)
+
+        # Worker process pool, started here (not in a timed move) and kept
+        # for the game
+        self.processes = processes
+        self._pool = None
+        self._pool_finalizer = None
+        self._search_id = 0
+        if processes:
+            self._start_pool()
+
+        # Zobrist keys: one 64-bit key per (cell, state) for a 7x7 board
+        # state 0 - blocked cell, 1 - player 1 location, 2 - player 2 location
+        # plus one key for the player to move
+        self._zobrist = [[random.getrandbits(64) for _ in range(3)] for _ in range(49)]
+        self._zobrist_turn = random.getrandbits(64)
+
+        # Transposition table: hash -> (depth, flag, value, best_move)
+        self._tt_clear()
+
+        # Evaluation cache: hash -> score of state
+        self._eval_cache = {}
+
+        # Killer moves: two most recent moves causing beta cutoff at each ply
+        # History: accumulated depth^2 of beta cutoffs caused by each move
+        self._killers = [[None, None] for _ in range(MAX_DEPTH)]
+        self._history = defaultdict(int)
+        self._root_move_count = 0
+
+    def _extend_zobrist(self, game):
+        """Add Zobrist keys for cells of boards larger than 7x7."""
+        while len(self._zobrist) < game.width * game.height:
+            self._zobrist.append([random.getrandbits(64) for _ in range(3)])
+
+    def _hash(self, game):
+        """Return Zobrist hash of the game state (blocked cells, player
+        locations and player to move).
+        """
+        zobrist = self._zobrist
+        board_state = game._board_state
+        h = 0
+
+        # Blocked cells
+        for idx, cell in enumerate(board_state[:-3]):
+            if cell:
+                h ^= zobrist[idx][0]
+
+        # Player locations (None when player has not moved yet)
+        if board_state[-1] is not None:
+            h ^= zobrist[board_state[-1]][1]
+        if board_state[-2] is not None:
+            h ^= zobrist[board_state[-2]][2]
+
+        # Player to move
+        if board_state[-3]:
+            h ^= self._zobrist_turn
+
+        return h
+
+    def _start_pool(self):
+        """Start worker processes of parallel search, terminated by `close`
+        or when the player is garbage collected.
+        """
+        self._pool = multiprocessing.Pool(self.processes)
+        self._pool_finalizer = weakref.finalize(self, _terminate_pool, self._pool)
+
+    def close(self):
+        """Terminate worker processes of parallel search, if any. A new pool
+        is created when `get_move` is called again.
+        """
+        if self._pool is not None:
+            self._pool_finalizer()
+            self._pool = None
+            self._pool_finalizer = None
+
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -341,29 +693,63 @@ class AlphaBetaPlayer(IsolationPlayer):
         """
         self.time_left = time_left
 
+        # Fresh transposition table and move ordering tables for each move,
+        # shared by every iterative deepening iteration
+        self._tt_clear()
+        self._eval_cache = {}
+        self._killers = [[None, None] for _ in range(MAX_DEPTH)]
+        self._history = defaultdict(int)
+
+        # Extend Zobrist keys when board is larger than 7x7
+        self._extend_zobrist(game)
+
+        # Workers keep their tables for the whole move as well
+        self._search_id += 1
+        if self.processes and (self._pool is None):
+            self._start_pool()
+        search = self._parallel_alphabeta if self._pool else self._aspiration_search
+        self._root_score = None
+
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
         best_move = (-1, -1)
 
         # Opening Book
-        # Check if my agent is first to move
+        # Check if game is in its first plies on a standard board
         # If yes, use opening book
-        if (game._board_state[-1] == None):
-            if (not game.get_legal_moves()):
-                return best_move
-            else:
-                best_move = (4,4)
-                return best_move
+        if (game.move_count < 3) and (game.width == 7) and (game.height == 7):
+            book_move = _book_move(game.get_player_location(self),
+                                   game.get_player_location(game.get_opponent(self)))
+            if book_move in game.get_legal_moves():
+                return book_move
+
+        # Depth 1 is skipped, so fall back to any legal move in case
+        # the first iteration does not finish
+        valid_moves = game.get_legal_moves()
+        if valid_moves:
+            best_move = valid_moves[0]
+
+        # Search deeper than number of blank cells reaches end of game
+        max_depth = len(game.get_blank_spaces())
 
         try:
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
 
-            # Iterative Deepning, stop when timeout
-            depth = 0
+            # Iterative Deepning, stop when timeout, when search reaches end
+            # of game or when next depth is not expected to finish in time
+            # (search time grows by about branching factor with each depth)
+            depth = ID_START_DEPTH - 1
             while (True):
                 depth += 1
-                best_move = self.alphabeta(game, depth)
+                start = time.monotonic()
+                best_move = search(game, depth)
+                elapsed = 1000. * (time.monotonic() - start)
+
+                if depth >= max_depth:
+                    break
+                if self.time_left() - self.TIMER_THRESHOLD < elapsed * ID_BRANCHING_FACTOR:
+                    break
 
         except SearchTimeout:
             pass  # Handle any actions required after timeout as needed
@@ -415,105 +801,34 @@ class AlphaBetaPlayer(IsolationPlayer):
                 pseudocode) then you must copy the timer check into the top of
                 each helper function or else your agent will timeout during
                 testing.
-        """
-        def max_value(self, game, depth, alpha, beta):
-            """This is helper function for alpha-beta prunnig on minimax
-                Min_value (self, game, depth, alpha, beta)
-
-                Parameters:
-                game: game state
-                depth: search depth
-                alpha: search upper limit
-                beta: search lower limit
-
-                Find maximum score of each game state corresponding to its legal moves
-                Set new alpha (search upper limit) if find score higher than current limit
-                Return score of that state when search complete.
-            """
-            
-            # Timeout Check
-            if self.time_left() < self.TIMER_THRESHOLD:
-                raise SearchTimeout()
 
-            # Get legal moves
-            valid_moves = game.get_legal_moves()
-            # Best possible score -> initiated at inf, the highest score possible
-            best_value = float("-inf")
-            
-            # Terminal State:
-            # When search reaches search limit or no legal moves left
-            # Return score of terminal state
-            if (depth == 0) or (not valid_moves):
-                return self.score(game, self)
-            
-            # Search each move in legal moves
-            for move in valid_moves:
-
-                # Update best possible value with current best or search value 
-                best_value = max(best_value, min_value(self, game.forecast_move(move), depth-1, alpha, beta))
-                
-                # Update beta when best bossible value is equal or higher than beta
-                if (best_value >= beta):
-                    return best_value
-
-                # Update alpha if best possible value is higher than alpha
-                alpha = max(best_value, alpha)
-                
-            # Return best value (in this case max value) 
-            return best_value
-        
-        def min_value(self, game, depth, alpha, beta):
-            """This is helper function for alpha-beta prunnig on minimax
-                Min_value (self, game, depth, alpha, beta)
-
-                Parameters:
-                game: game state
-                depth: search depth
-                alpha: search upper limit
-                beta: search lower limit
-
-                Find minimum score of each game state corresponding to its legal moves
-                Set new beta (search lower limit) if find score lower than current limit
-                Return score of that state when search complete.
-            """
-            
-            # Timeout Check
-            if self.time_left() < self.TIMER_THRESHOLD:
-                raise SearchTimeout()
-            
-            # Get legal moves
-            valid_moves = game.get_legal_moves()
-            # Best possible score -> initiated at inf, the highest score possible
-            best_value = float("inf")
-            
-            # Terminal State:
-            # When search reaches search limit or no legal moves left
-            # Return score of terminal state
-            if (depth == 0) or (not valid_moves):
-                return self.score(game, self)
-            
-            # Search each move in legal moves
-            for move in valid_moves:
-                
-                # Update best possible value with current best or search value 
-                best_value = min(best_value, max_value(self, game.forecast_move(move), depth-1, alpha, beta))
-                
-                # Update beta when best bossible value is equal or lower than alpha
-                if (best_value <= alpha):
-                    return best_value
-                
-                # Update alpha if best possible value is lower than beta
-                beta = min(best_value, beta)
-                
-            return best_value
-        
+            (3) When game_agent_core is built and `self.score` is
+                `custom_score`, `custom_score_2` or `custom_score_3`, the
+                search runs compiled and `self.score` is bypassed: states are
+                scored by the compiled twin of the heuristic (see
+                `_core_state`).
+        """
         # Timeout Check
         if self.time_left() < self.TIMER_THRESHOLD:
             raise SearchTimeout()
 
+        # Cache search deadline so helper functions only need to read the clock
+        self._deadline = time.monotonic() + (self.time_left() - self.TIMER_THRESHOLD) / 1000.
+        self._node_count = 0
+
+        # Extend Zobrist keys when board is larger than 7x7
+        self._extend_zobrist(game)
+
+        # Ply of each searched state is counted from this state
+        self._root_move_count = game.move_count
+
+        # Moves are made and taken back in place on a private copy, so the
+        # caller's game is untouched even when search times out
+        game = game.copy()
+
         # Main MiniMax Function
         # Get legal moves
-        valid_moves = game.get_legal_moves()
+        valid_moves = _legal_moves(game)
 
         # Best possible move -> initiated at (-1,-1)
         # Best possible score -> initiated at -inf, the lowest score possible
@@ -524,19 +839,488 @@ class AlphaBetaPlayer(IsolationPlayer):
         # When no legal moves left return (-1, -1) move to forfeit
         if (depth == 0) or (not valid_moves):
             return (-1, -1)
+
+        # Search best move from previous iteration first (stored in
+        # transposition table), it is most likely to cause cutoffs
+        # (Principal Variation ordering), then most promising moves
+        h = self._hash(game)
+        entry = self._tt_lookup(h)
+        tt_move = entry[3] if (entry is not None) else None
+
+        # Compiled search when it implements the heuristic and board fits
+        state = self._core_state(game)
+        if state is not None:
+            return self._core_alphabeta(state, game, h, depth, alpha, beta, tt_move)
+        ordered_moves = self._ordered_moves(game, valid_moves, tt_move, depth, True)
+        alpha_orig = alpha
         
         # Search best move from each move in legal moves
-        # Using minimax by first call min_value (helper function)
+        # Using negamax (helper function) from opponent's point of view
         # While searching, if any move return better score than current best
         # core, set that move and corresponding score as new target also set new upper limit with maximum score so far
         # Search ends when score is higher than beta
-        for move in valid_moves:
-            score = min_value(self, game.forecast_move(move), depth -1, alpha, beta)
-            if (score > best_score):
+        for move in ordered_moves:
+            undo, child_h = self._make_move_hashed(game, move, h)
+            score = -self._negamax(game, child_h, depth-1, -beta, -alpha, -1)
+            _unmake_move(game, undo)
+            # First move is kept even when every move loses (-inf score)
+            if (score > best_score) or (best_move == (-1, -1)):
                 best_score = score
                 best_move = move
                 alpha = max(alpha, score)
                 if best_score >= beta:
-                    return best_move
+                    break
+
+        if best_move != (-1, -1):
+            self._tt_store(h, depth, alpha_orig, beta, best_score, best_move)
+
+        # Keep score of the search for aspiration window of the next search
+        self._root_score = best_score
 
         return best_move
+
+    def _core_state(self, game):
+        """Return `game` as a compiled search state of this player, or None
+        when compiled search cannot search it: module is not built,
+        `self.score` is not one of the heuristics it implements, board does
+        not fit in 64 bits or a player is not on the board yet.
+
+        Compiled search scores states with its own copy of `self.score`, the
+        two are compared on `game` every time. When they differ, a warning is
+        issued and the heuristic is searched in Python from then on.
+        """
+        if ((_core is None) or (self.score not in _CORE_SCORES)
+                or (game.width * game.height > 64)
+                or (None in game._board_state[-2:])):
+            return None
+
+        board_state = game._board_state
+        if (game.width == 7) and (game.height == 7):
+            masks = KNIGHT_MASK
+        else:
+            masks = _knight_masks(game.width, game.height)
+        occupied = int(bytes(board_state[:-3]).translate(_BIT_CHARS)[::-1], 2)
+        own_slot, opp_slot = (-1, -2) if (game._player_1 == self) else (-2, -1)
+
+        state = _core.SearchState(occupied, board_state[own_slot], board_state[opp_slot],
+                                  masks, _CORE_SCORES[self.score],
+                                  self._deadline - time.monotonic())
+
+        if state.evaluate() != self.score(game, self):
+            warnings.warn("{} differs from its compiled twin in game_agent_core.pyx, "
+                          "searching it in Python".format(self.score.__name__))
+            _CORE_SCORES.pop(self.score, None)
+            return None
+        return state
+
+    def _core_alphabeta(self, state, game, h, depth, alpha, beta, tt_move):
+        """Root of `alphabeta` searched by the compiled search from `state`
+        (see `_core_state`).
+
+        Returns
+        -------
+        (int, int)
+            The board coordinates of the best move found in the current search;
+            (-1, -1) if there are no legal moves
+        """
+        first_idx = -1 if (tt_move is None) else tt_move[0] + tt_move[1] * game.height
+        best_idx, best_score = state.search(depth, alpha, beta, first_idx)
+        if state.timed_out:
+            raise SearchTimeout()
+
+        best_move = (-1, -1)
+        if best_idx >= 0:
+            best_move = (best_idx % game.height, best_idx // game.height)
+            self._tt_store(h, depth, alpha, beta, best_score, best_move)
+
+        # Keep score of the search for aspiration window of the next search
+        self._root_score = best_score
+        return best_move
+
+    def _aspiration_search(self, game, depth):
+        """Alpha-beta search with a narrow window around the score of the
+        previous iterative deepening iteration. When the score falls outside
+        the window, search again with full window.
+
+        Returns
+        -------
+        (int, int)
+            The board coordinates of the best move found in the current search;
+            (-1, -1) if there are no legal moves
+        """
+        prev_score = self._root_score
+
+        # No previous score, or game already decided: full window
+        if (prev_score is None) or (abs(prev_score) == float("inf")):
+            return self.alphabeta(game, depth)
+
+        alpha = prev_score - ASPIRATION_WINDOW
+        beta = prev_score + ASPIRATION_WINDOW
+        best_move = self.alphabeta(game, depth, alpha, beta)
+        if alpha < self._root_score < beta:
+            return best_move
+
+        # Fail low or fail high: score is only a bound, search again
+        return self.alphabeta(game, depth)
+
+    def _parallel_alphabeta(self, game, depth):
+        """Depth-limited alpha-beta search with each root move searched by a
+        worker process. Workers do not share alpha-beta bounds or tables.
+
+        Returns
+        -------
+        (int, int)
+            The board coordinates of the best move found in the current search;
+            (-1, -1) if there are no legal moves
+        """
+        # Timeout Check
+        if self.time_left() < self.TIMER_THRESHOLD:
+            raise SearchTimeout()
+        deadline = time.monotonic() + (self.time_left() - self.TIMER_THRESHOLD) / 1000.
+
+        # Get legal moves
+        valid_moves = _legal_moves(game)
+        if (depth == 0) or (not valid_moves):
+            return (-1, -1)
+
+        # Players are not sent to workers (they hold timer and process pool),
+        # copy of the game refers to placeholder players instead
+        board = game.copy()
+        own_slot = 1 if (board._player_1 == self) else 2
+        _replace_player(board, self, object())
+        _replace_player(board, game.get_opponent(self), object())
+
+        results = [self._pool.apply_async(_root_search_worker,
+                                          (board, own_slot, move, depth, deadline,
+                                           self.score, self.TIMER_THRESHOLD, self._search_id))
+                   for move in valid_moves]
+
+        # Best possible move -> initiated at (-1,-1)
+        # Best possible score -> initiated at -inf, the lowest score possible
+        best_score = float("-inf")
+        best_move = (-1, -1)
+
+        for result in results:
+            try:
+                move, score = result.get(max(0., deadline - time.monotonic()))
+            except multiprocessing.TimeoutError:
+                raise SearchTimeout()
+
+            # Worker ran out of time
+            if score is None:
+                raise SearchTimeout()
+
+            # First move is kept even when every move loses (-inf score)
+            if (score > best_score) or (best_move == (-1, -1)):
+                best_score = score
+                best_move = move
+
+        return best_move
+
+    def _negamax(self, game, h, depth, alpha, beta, color, extended=False):
+        """This is helper function for alpha-beta prunnig on minimax
+            _negamax (self, game, h, depth, alpha, beta, color, extended)
+
+            Parameters:
+            game: game state
+            h: Zobrist hash of game state
+            depth: search depth
+            alpha: search lower limit
+            beta: search upper limit
+            color: +1 when my agent is to move, -1 when opponent is to move
+            extended: True when search path was already extended by a
+                forced move
+
+            Find maximum negated score of each game state corresponding to its
+            legal moves, i.e. the score from point of view of player to move.
+            Set new alpha (search lower limit) if find score higher than current limit
+            Return score of that state when search complete.
+        """
+
+        # Timeout Check (amortized over TIMER_CHECK_MASK + 1 nodes)
+        self._node_count += 1
+        if not (self._node_count & TIMER_CHECK_MASK) and time.monotonic() > self._deadline:
+            raise SearchTimeout()
+
+        # Transposition Table Lookup:
+        # Return stored value or tighten alpha/beta when stored search
+        # is at least as deep as current search
+        tt_move, alpha, beta, tt_value = self._tt_probe(h, depth, alpha, beta)
+        if tt_value is not None:
+            return tt_value
+        alpha_orig, beta_orig = alpha, beta
+
+        # Get legal moves
+        valid_moves = _legal_moves(game)
+
+        # Forced Move Extension:
+        # When player to move has a single legal move, search one ply deeper
+        # (once per search path) to see the consequence of the forced move
+        extend = (len(valid_moves) == 1) and (not extended)
+
+        # Terminal State:
+        # When search reaches search limit or no legal moves left
+        # Return score of terminal state for player to move
+        if ((depth == 0) and (not extend)) or (not valid_moves):
+            return color * self._cached_score(game, h)
+        child_depth = depth if extend else depth-1
+        extended = extended or extend
+
+        # Best possible score -> initiated at -inf, the lowest score possible
+        best_value = float("-inf")
+        best_move = None
+
+        # Search stored best move first, then killer moves of this ply,
+        # then most promising moves
+        killers = self._killers[game.move_count - self._root_move_count]
+        ordered_moves = self._ordered_moves(game, valid_moves, tt_move, depth, color == 1, killers)
+
+        # Local aliases avoid attribute lookups inside the loop
+        negamax = self._negamax
+        make_move = self._make_move_hashed
+
+        # Search each move in legal moves
+        for move in ordered_moves:
+
+            # Update best possible value with current best or search value
+            undo, child_h = make_move(game, move, h)
+            value = -negamax(game, child_h, child_depth, -beta, -alpha, -color, extended)
+            _unmake_move(game, undo)
+            if (value > best_value) or (best_move is None):
+                best_value = value
+                best_move = move
+
+            # Cutoff when best possible value is equal or higher than beta
+            # Remember the move as killer of this ply and in history table
+            if (best_value >= beta):
+                if move != killers[0]:
+                    killers[1] = killers[0]
+                    killers[0] = move
+                self._history[move] += depth * depth
+                break
+
+            # Update alpha if best possible value is higher than alpha
+            alpha = max(best_value, alpha)
+
+        self._tt_store(h, depth, alpha_orig, beta_orig, best_value, best_move)
+
+        # Return best value
+        return best_value
+
+    def _cached_score(self, game, h):
+        """Return `self.score(game, self)`, memoized on state hash `h`.
+        Leaves reached through different move orders are evaluated once.
+        """
+        value = self._eval_cache.get(h)
+        if value is None:
+            value = self.score(game, self)
+            self._eval_cache[h] = value
+        return value
+
+    def _ordered_moves(self, game, valid_moves, tt_move, depth, maximizing, killers=()):
+        """Order legal moves for search.
+
+        Stored best move (from transposition table) is searched first, then
+        killer moves of the current ply. The rest are sorted by history score,
+        ties broken by mobility difference (own moves - opponent moves) after
+        the move: best first for maximizing player and worst first for
+        minimizing player. Children of depth 1 nodes are leaves, computing
+        their mobility costs as much as evaluating them, so only history
+        score is used there.
+
+        Returns
+        -------
+        list of (int, int)
+            Legal moves in search order
+        """
+        history = self._history.get
+        moves = list(valid_moves)
+
+        if depth > 1:
+            sign = -1 if maximizing else 1
+
+            def mobility(move):
+                undo = _make_move(game, move)
+                own_moves, opp_moves = _both_move_counts(game, self)
+                _unmake_move(game, undo)
+                return sign * (own_moves - opp_moves)
+
+            moves.sort(key=lambda m: (-history(m, 0), mobility(m)))
+        else:
+            moves.sort(key=lambda m: -history(m, 0))
+
+        # Move killer moves, then stored best move to the front
+        for first in (*reversed(killers), tt_move):
+            if (first is not None) and (first in moves):
+                moves.remove(first)
+                moves.insert(0, first)
+
+        return moves
+
+    def _make_move_hashed(self, game, move, h):
+        """Apply `move` to `game` in place (see `_make_move`) and update
+        Zobrist hash `h` of the game state incrementally: the moved-to cell
+        gets blocked, the mover's location key moves from its previous cell
+        to the new one, and the player to move changes. The caller keeps `h`
+        for the state restored by `_unmake_move`.
+
+        Returns
+        -------
+        (tuple, int)
+            Undo record for `_unmake_move` and hash of the new state
+        """
+        undo = _make_move(game, move)
+        idx, slot, prev_loc = undo
+        zobrist = self._zobrist
+
+        # Location keys: 1 - player 1 (slot -1), 2 - player 2 (slot -2)
+        loc_key = 1 if (slot == -1) else 2
+        h ^= zobrist[idx][0] ^ zobrist[idx][loc_key] ^ self._zobrist_turn
+        if prev_loc is not None:
+            h ^= zobrist[prev_loc][loc_key]
+
+        return undo, h
+
+    def _tt_clear(self):
+        """Allocate empty transposition table.
+
+        Entries are kept in flat typed arrays (23 bytes per entry) instead
+        of a dict of tuples. Slot `h & TT_MASK` is the depth-preferred bucket
+        and slot `TT_SIZE + (h & TT_MASK)` is the always-replace bucket.
+        Moves are stored as `row << 8 | col` (-1 for no move).
+        """
+        n = 2 * TT_SIZE
+        self._tt_keys = array('Q', bytes(8 * n))
+        self._tt_depths = array('i', bytes(4 * n))
+        self._tt_flags = array('b', bytes(n))
+        self._tt_values = array('d', bytes(8 * n))
+        self._tt_moves = array('h', bytes(2 * n))
+
+    def _tt_lookup(self, h):
+        """Return stored (depth, flag, value, best_move) of state hash `h`,
+        None if state is not in transposition table.
+        """
+        keys = self._tt_keys
+        i = h & TT_MASK
+        if keys[i] != h:
+            i += TT_SIZE
+            if keys[i] != h:
+                return None
+
+        mv = self._tt_moves[i]
+        move = (mv >> 8, mv & 0xFF) if mv >= 0 else None
+        return self._tt_depths[i], self._tt_flags[i], self._tt_values[i], move
+
+    def _tt_probe(self, h, depth, alpha, beta):
+        """Look up state hash `h` in transposition table.
+
+        Returns
+        -------
+        (move, alpha, beta, value)
+            Stored best move (or None), alpha and beta tightened by stored
+            bound, and stored value when it can be returned directly (None
+            otherwise).
+        """
+        entry = self._tt_lookup(h)
+        if entry is None:
+            return None, alpha, beta, None
+
+        tt_depth, tt_flag, tt_value, tt_move = entry
+        # Stored search is too shallow: only use its move for ordering
+        if tt_depth < depth:
+            return tt_move, alpha, beta, None
+
+        if tt_flag == TT_EXACT:
+            return tt_move, alpha, beta, tt_value
+        elif tt_flag == TT_LOWER:
+            alpha = max(alpha, tt_value)
+        else:
+            beta = min(beta, tt_value)
+
+        # Stored bound alone causes cutoff
+        if alpha >= beta:
+            return tt_move, alpha, beta, tt_value
+
+        return tt_move, alpha, beta, None
+
+    def _tt_store(self, h, depth, alpha, beta, value, move):
+        """Store search result of state hash `h` in transposition table.
+        `alpha` and `beta` are the bounds the state was searched with.
+        """
+        if value <= alpha:
+            flag = TT_UPPER
+        elif value >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+
+        # Replace depth-preferred entry when new search is at least as deep
+        # or state is the same, otherwise use always-replace bucket
+        i = h & TT_MASK
+        if (depth < self._tt_depths[i]) and (self._tt_keys[i] != h):
+            i += TT_SIZE
+
+        self._tt_keys[i] = h
+        self._tt_depths[i] = depth
+        self._tt_flags[i] = flag
+        self._tt_values[i] = value
+        self._tt_moves[i] = (move[0] << 8 | move[1]) if move is not None else -1
+
+
+def _terminate_pool(pool):
+    """Terminate worker processes of `pool` and wait for them to exit."""
+    pool.terminate()
+    pool.join()
+
+
+def _replace_player(game, old, new):
+    """Replace player `old` with `new` in every player reference of `game`."""
+    for attr in ('_player_1', '_player_2', '_active_player', '_inactive_player'):
+        if getattr(game, attr) is old:
+            setattr(game, attr, new)
+
+
+# Search player of a worker process and id of the search it belongs to
+_worker_player = None
+_worker_search_id = None
+
+
+def _root_search_worker(game, own_slot, move, depth, deadline, score_fn, timeout, search_id):
+    """Search root `move` of `game` in a worker process.
+
+    The worker keeps one `AlphaBetaPlayer` whose tables are shared by every
+    root move and depth of the same search (`search_id`).
+
+    Returns
+    -------
+    ((int, int), float)
+        Searched move and its score; score is None when search timed out
+    """
+    global _worker_player, _worker_search_id
+    if (_worker_player is None) or (_worker_player.score is not score_fn):
+        _worker_player = AlphaBetaPlayer(score_fn=score_fn, timeout=timeout)
+    player = _worker_player
+
+    if search_id != _worker_search_id:
+        _worker_search_id = search_id
+        player._tt_clear()
+        player._eval_cache = {}
+        player._killers = [[None, None] for _ in range(MAX_DEPTH)]
+        player._history = defaultdict(int)
+        player._extend_zobrist(game)
+
+    # Put worker player in place of searching player
+    _replace_player(game, game._player_1 if own_slot == 1 else game._player_2, player)
+
+    player._deadline = deadline
+    player._node_count = 0
+    player._root_move_count = game.move_count
+    try:
+        undo, h = player._make_move_hashed(game, move, player._hash(game))
+        state = player._core_state(game)
+        if state is not None:
+            value = state.value(depth-1, float("-inf"), float("inf"), -1)
+            return move, (None if state.timed_out else -value)
+        return move, -player._negamax(game, h, depth-1, float("-inf"), float("inf"), -1)
+    except SearchTimeout:
+        return move, None
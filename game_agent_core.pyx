@@ -0,0 +1,272 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""Optional compiled alpha-beta search of `game_agent`.
+
+Build in place with
+
+    python setup.py build_ext --inplace
+
+When the compiled module is importable, `AlphaBetaPlayer.alphabeta` runs
+its search here for boards of at most 64 cells with both players placed,
+if the player scores states with `custom_score`, `custom_score_2` or
+`custom_score_3` (re-implemented below on bitboards).
+"""
+from libc.math cimport INFINITY, log
+from posix.time cimport CLOCK_MONOTONIC, clock_gettime, timespec
+
+# Heuristics of `game_agent`: moves difference, moves ratio, log moves ratio
+cdef enum:
+    SCORE_DIFF = 0
+    SCORE_RATIO = 1
+    SCORE_LOG_RATIO = 2
+
+# Clock is read once per TIMER_CHECK_MASK + 1 nodes
+cdef enum:
+    TIMER_CHECK_MASK = 0x3FF
+
+# Cell index of the single set bit of a 64-bit word (de Bruijn sequence)
+cdef unsigned long long DEBRUIJN = 0x03F79D71B4CB0A89ULL
+cdef int DEBRUIJN_INDEX[64]
+cdef int _i
+for _i in range(64):
+    DEBRUIJN_INDEX[((1ULL << _i) * DEBRUIJN) >> 58] = _i
+
+
+cdef inline int popcount(unsigned long long x) noexcept nogil:
+    cdef int n = 0
+    while x:
+        x &= x - 1
+        n += 1
+    return n
+
+
+cdef inline int lowest_bit_index(unsigned long long x) noexcept nogil:
+    return DEBRUIJN_INDEX[((x & (~x + 1)) * DEBRUIJN) >> 58]
+
+
+cdef inline double monotonic() noexcept nogil:
+    cdef timespec ts
+    clock_gettime(CLOCK_MONOTONIC, &ts)
+    return ts.tv_sec + ts.tv_nsec * 1e-9
+
+
+cdef class SearchState:
+    """Board state of an alpha-beta search on bitboards.
+
+    Parameters
+    ----------
+    occupied : int
+        Bitboard of blocked cells (bit index is `row + column * height`)
+    own_idx, opp_idx : int
+        Cell index of searching player and of opponent
+    masks : list of int
+        Knight move bitboard of each cell
+    score_kind : int
+        Heuristic: 0 - `custom_score`, 1 - `custom_score_2`,
+        2 - `custom_score_3`
+    time_budget : float
+        Seconds until search must be aborted
+    """
+
+    cdef unsigned long long occupied
+    cdef unsigned long long masks[64]
+    cdef int loc[2]
+    cdef int score_kind
+    cdef double deadline
+    cdef unsigned long node_count
+    cdef readonly bint timed_out
+
+    def __init__(self, unsigned long long occupied, int own_idx, int opp_idx,
+                 masks, int score_kind, double time_budget):
+        cdef int idx
+        if len(masks) > 64:
+            raise ValueError("board has more than 64 cells")
+        for idx in range(64):
+            self.masks[idx] = masks[idx] if (idx < len(masks)) else 0
+        self.occupied = occupied
+        self.loc[0] = own_idx
+        self.loc[1] = opp_idx
+        self.score_kind = score_kind
+        self.deadline = monotonic() + time_budget
+        self.node_count = 0
+        self.timed_out = False
+
+    def evaluate(self):
+        """Heuristic value of the state for the searching player, see
+        `score`.
+        """
+        return self.score()
+
+    cdef inline double score(self) noexcept nogil:
+        """Heuristic value of the state for the searching player: twin of
+        `custom_score`, `custom_score_2` or `custom_score_3` of `game_agent`,
+        keep in sync (`AlphaBetaPlayer._core_state` compares them).
+        """
+        cdef unsigned long long blank = ~self.occupied
+        cdef int own_moves = popcount(self.masks[self.loc[0]] & blank)
+        cdef int opp_moves = popcount(self.masks[self.loc[1]] & blank)
+
+        if self.score_kind == SCORE_DIFF:
+            return own_moves - opp_moves
+        if opp_moves == 0:
+            return INFINITY
+        if own_moves == 0:
+            return -INFINITY
+        if self.score_kind == SCORE_RATIO:
+            return <double>own_moves / opp_moves
+        return log(<double>own_moves / opp_moves)
+
+    cdef int ordered_moves(self, unsigned long long moves, int mover, int sign,
+                           int *order) noexcept nogil:
+        """Write cell indexes of `moves` to `order`, sorted by `sign` times
+        mobility difference (own moves - opponent moves) after the move,
+        and return their number.
+        """
+        cdef int keys[8]
+        cdef int n = 0
+        cdef int i, idx, key
+        cdef unsigned long long blank
+        cdef int prev = self.loc[mover]
+
+        while moves:
+            idx = lowest_bit_index(moves)
+            moves &= moves - 1
+
+            # Mobility difference after the move
+            self.loc[mover] = idx
+            blank = ~(self.occupied | (1ULL << idx))
+            key = sign * (popcount(self.masks[self.loc[0]] & blank)
+                          - popcount(self.masks[self.loc[1]] & blank))
+
+            # Insertion sort, stable like `list.sort`
+            i = n
+            while (i > 0) and (keys[i - 1] > key):
+                keys[i] = keys[i - 1]
+                order[i] = order[i - 1]
+                i -= 1
+            keys[i] = key
+            order[i] = idx
+            n += 1
+
+        self.loc[mover] = prev
+        return n
+
+    cdef double negamax(self, int depth, double alpha, double beta, int color,
+                        bint extended) noexcept nogil:
+        """Value of the state for the player to move (`color` +1 when the
+        searching player is to move), as `AlphaBetaPlayer._negamax`.
+        """
+        cdef int mover = 0 if (color == 1) else 1
+        cdef int prev = self.loc[mover]
+        cdef unsigned long long moves
+        cdef int order[8]
+        cdef int n, i, idx, child_depth
+        cdef bint extend
+        cdef double value, best_value = -INFINITY
+
+        # Timeout Check (amortized over TIMER_CHECK_MASK + 1 nodes)
+        self.node_count += 1
+        if not (self.node_count & TIMER_CHECK_MASK) and monotonic() > self.deadline:
+            self.timed_out = True
+        if self.timed_out:
+            return 0.
+
+        moves = self.masks[prev] & ~self.occupied
+
+        # Forced Move Extension
+        extend = (moves != 0) and ((moves & (moves - 1)) == 0) and (not extended)
+
+        # Terminal State
+        if ((depth == 0) and (not extend)) or (moves == 0):
+            return color * self.score()
+
+        child_depth = depth if extend else depth - 1
+        extended = extended or extend
+
+        # Children of depth 1 nodes are leaves, keep bit order there
+        if depth > 1:
+            n = self.ordered_moves(moves, mover, -color, order)
+        else:
+            n = 0
+            while moves:
+                order[n] = lowest_bit_index(moves)
+                moves &= moves - 1
+                n += 1
+
+        for i in range(n):
+            idx = order[i]
+            self.occupied |= 1ULL << idx
+            self.loc[mover] = idx
+            value = -self.negamax(child_depth, -beta, -alpha, -color, extended)
+            self.loc[mover] = prev
+            self.occupied &= ~(1ULL << idx)
+
+            if (value > best_value) or (i == 0):
+                best_value = value
+            if best_value >= beta:
+                break
+            alpha = max(best_value, alpha)
+
+        return best_value
+
+    def value(self, int depth, double alpha, double beta, int color):
+        """Value of the state searched to `depth` for the player to move
+        (`color` +1 when the searching player is to move); `timed_out` is
+        set when search was aborted.
+        """
+        cdef double value
+        with nogil:
+            value = self.negamax(depth, alpha, beta, color, False)
+        return value
+
+    def search(self, int depth, double alpha, double beta, int first_idx=-1):
+        """Search root moves of the searching player to `depth`, starting
+        with `first_idx` when it is a legal move.
+
+        Returns
+        -------
+        (int, float)
+            Cell index of the best move (-1 if there are no legal moves)
+            and its score; `timed_out` is set when search was aborted
+        """
+        cdef int order[8]
+        cdef int n, i, j, idx
+        cdef int prev = self.loc[0]
+        cdef unsigned long long moves = self.masks[prev] & ~self.occupied
+        cdef double score, best_score = -INFINITY
+        cdef int best_idx = -1
+
+        with nogil:
+            n = self.ordered_moves(moves, 0, -1, order) if (depth > 1) else 0
+            if depth <= 1:
+                while moves:
+                    order[n] = lowest_bit_index(moves)
+                    moves &= moves - 1
+                    n += 1
+
+            # Search best move of the previous search first
+            for i in range(n):
+                if order[i] == first_idx:
+                    for j in range(i, 0, -1):
+                        order[j] = order[j - 1]
+                    order[0] = first_idx
+                    break
+
+            for i in range(n):
+                idx = order[i]
+                self.occupied |= 1ULL << idx
+                self.loc[0] = idx
+                score = -self.negamax(depth - 1, -beta, -alpha, -1, False)
+                self.loc[0] = prev
+                self.occupied &= ~(1ULL << idx)
+                if self.timed_out:
+                    break
+
+                # First move is kept even when every move loses (-inf score)
+                if (score > best_score) or (best_idx == -1):
+                    best_score = score
+                    best_idx = idx
+                    alpha = max(alpha, score)
+                    if best_score >= beta:
+                        break
+
+        return best_idx, best_score
@@ -0,0 +1,104 @@
+"""Generate `OPENING_BOOK` for `game_agent.py`.
+
+The first move is hand-picked (`FIRST_MOVE`): a fixed depth search cannot
+tell first moves apart on an empty board. Every second and third ply
+position the book covers is searched by a fixed depth alpha-beta search
+with `custom_score` and no time limit, so the book is reproducible.
+Positions that are mirror images or rotations of each other share one
+book entry (see `game_agent._book_move`).
+
+Usage: python opening_book.py [depth]
+"""
+import random
+import sys
+
+import isolation
+import game_agent
+from game_agent import BOOK_CELLS, AlphaBetaPlayer, _canonical_book_key, custom_score
+
+BOARD_SIZE = 7
+BOOK_DEPTH = 11
+SEED = 0
+
+# First player's first move, next to the center
+FIRST_MOVE = (4, 4)
+
+
+def search(key, depth):
+    """Search position given by book key (own location, opponent location)
+    to fixed `depth` and return best move of the player to move.
+    """
+    own_loc, opp_loc = key
+
+    # Fresh seeded players so Zobrist keys and tables do not depend on
+    # previously searched positions
+    random.seed(SEED)
+    player_1 = AlphaBetaPlayer(score_fn=custom_score)
+    player_2 = AlphaBetaPlayer(score_fn=custom_score)
+    game = isolation.Board(player_1, player_2, BOARD_SIZE, BOARD_SIZE)
+
+    # First player is to move when both players are (or are not) placed
+    if (own_loc is None) == (opp_loc is None):
+        moves = (own_loc, opp_loc)
+    else:
+        moves = (opp_loc,)
+    for move in moves:
+        if move is not None:
+            game.apply_move(move)
+
+    player = game.active_player
+    player.time_left = lambda: float("inf")
+    return player.alphabeta(game, depth)
+
+
+def generate(depth=BOOK_DEPTH):
+    """Return opening book: (own location, opponent location) -> move."""
+    # Book is searched by the Python search, whether or not the compiled
+    # search (game_agent_core) is built, so it does not depend on the build
+    core, game_agent._core = game_agent._core, None
+    try:
+        return _generate(depth)
+    finally:
+        game_agent._core = core
+
+
+def _generate(depth):
+    """Search book positions, see `generate`."""
+    # Ply 0: first player's first move
+    book = {(None, None): FIRST_MOVE}
+
+    # Ply 1: second player's first move, then first player's second move
+    # after the book's first move; one entry per set of symmetric positions
+    keys = [(None, opp_loc) for opp_loc in BOOK_CELLS]
+    keys += [(FIRST_MOVE, opp_loc) for opp_loc in BOOK_CELLS if opp_loc != FIRST_MOVE]
+    for key in keys:
+        canon_key = _canonical_book_key(key)[0]
+        if canon_key not in book:
+            book[canon_key] = search(canon_key, depth)
+
+    return book
+
+
+PLY_COMMENTS = ("# Ply 0: first player's first move (hand-picked)",
+                "# Ply 1: second player's first move",
+                "# Ply 2: first player's second move after the first move "
+                "(or its image)")
+
+
+def format_book(book):
+    """Format opening book as Python source, three entries per line."""
+    lines = ["OPENING_BOOK = {"]
+    for ply, comment in enumerate(PLY_COMMENTS):
+        keys = sorted((key for key in book if sum(loc is not None for loc in key) == ply),
+                      key=lambda key: [loc or (-1, -1) for loc in key])
+        entries = ["{!r}: {!r},".format(key, book[key]) for key in keys]
+        lines.append("    " + comment)
+        for i in range(0, len(entries), 3):
+            lines.append("    " + " ".join(entries[i:i + 3]))
+    lines.append("}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    depth = int(sys.argv[1]) if (len(sys.argv) > 1) else BOOK_DEPTH
+    print(format_book(generate(depth)))
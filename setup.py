@@ -0,0 +1,11 @@
+"""Build the optional compiled search of `game_agent` in place with
+
+    python setup.py build_ext --inplace
+"""
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="game_agent_core",
+    ext_modules=cythonize("game_agent_core.pyx"),
+)